@@ -1,11 +1,9 @@
 import os
 import json
+import orjson
 import time
 from typing import Dict, Any, List, Optional
-import snowflake.connector
 from app.config import get_settings
-import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted
 
 settings = get_settings()
 
@@ -23,6 +21,8 @@ class AnalysisAgent:
         ])
         
         if settings.gemini_api_key:
+            import google.generativeai as genai
+            
             genai.configure(api_key=settings.gemini_api_key)
             self.model = genai.GenerativeModel('gemini-2.0-flash')
             self.use_gemini = True
@@ -37,6 +37,8 @@ class AnalysisAgent:
         if not self.use_snowflake:
             raise ValueError("Snowflake not configured")
         
+        import snowflake.connector
+        
         return snowflake.connector.connect(
             user=settings.snowflake_user,
             password=settings.snowflake_password,
@@ -253,6 +255,8 @@ IMPORTANT RULES:
                 "error": "Gemini API not configured"
             }
         
+        from google.api_core.exceptions import ResourceExhausted
+        
         # Throttle requests
         current_time = time.time()
         time_since_last = current_time - self.last_request_time
@@ -328,7 +332,7 @@ Respond with JSON containing sql_query and chart_type selection."""
                 end = response_text.find("```", start)
                 response_text = response_text[start:end]
             
-            analysis = json.loads(response_text.strip())
+            analysis = orjson.loads(response_text.strip())
             
             # Check if this requires a followup (data doesn't exist, impossible request, etc.)
             if analysis.get("requires_followup") or not analysis.get("sql_query"):
@@ -471,7 +475,7 @@ RESPOND WITH JSON ONLY - NO OTHER TEXT:"""
                     insights_text = insights_text[start:end]
                 
                 try:
-                    insights_data = json.loads(insights_text.strip())
+                    insights_data = orjson.loads(insights_text.strip())
                     summary = insights_data.get("summary", "")
                     insights = insights_data.get("insights", [])
                     
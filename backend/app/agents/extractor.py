@@ -1,18 +1,27 @@
+import asyncio
 import os
-import json
+import orjson
 import requests
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from landingai_ade import LandingAIADE
 from landingai_ade.lib import pydantic_to_json_schema
 from pydantic import BaseModel, Field, create_model
-import google.generativeai as genai
-from app.models import ExtractionResult, ExtractedField, DocumentType
+from app.models import ExtractionResult, DocumentType
 from app.config import get_settings
 from app.agents.prompts import extraction_prompt, extraction_prompt_with_user_input
 
 settings = get_settings()
 
+# Model-reported document types (and common aliases) to DocumentType values, built once
+_DOCUMENT_TYPE_MAP: Dict[str, str] = {
+    'balance_sheet': DocumentType.BALANCE_SHEET.value,
+    'income_statement': DocumentType.INCOME_STATEMENT.value,
+    'profit_loss': DocumentType.INCOME_STATEMENT.value,
+    'p&l': DocumentType.INCOME_STATEMENT.value,
+    'cash_flow': DocumentType.CASH_FLOW.value,
+}
+
 class DocumentExtractor:
     """Extract financial data from documents using LandingAI"""
     
@@ -34,9 +43,14 @@ class DocumentExtractor:
         else:
             print("⚠️  LandingAI API key not found - using mock extraction")
         
+        # Bounds concurrent LandingAI parse calls made through this extractor
+        self._parse_slots = asyncio.Semaphore(settings.extract_concurrency)
+        
         # Initialize Gemini for metric suggestions
         if self.gemini_api_key:
             try:
+                import google.generativeai as genai
+                
                 genai.configure(api_key=self.gemini_api_key)
                 self.gemini_model = genai.GenerativeModel('gemini-2.5-flash')
                 self.use_gemini = True
@@ -48,8 +62,31 @@ class DocumentExtractor:
             self.use_gemini = False
             print("⚠️  Gemini API key not found - metric suggestions unavailable")
     
+    @staticmethod
+    def markdown_path_for(file_path: str, output_dir: str) -> str:
+        """Where the markdown for a document is saved (keeps the source extension so report.pdf and report.xlsx don't collide)"""
+        return os.path.join(output_dir, f"{os.path.basename(file_path)}.md")
+    
+    @classmethod
+    def cached_markdown(cls, file_path: str, output_dir: str) -> Optional[str]:
+        """Previously saved markdown for a document, if it's newer than the document itself"""
+        markdown_path = cls.markdown_path_for(file_path, output_dir)
+        try:
+            if os.stat(markdown_path).st_mtime >= os.stat(file_path).st_mtime:
+                return markdown_path
+        except OSError:
+            pass
+        return None
+    
     async def extract_markdown_from_document(self, file_path: str, output_dir: str = "./") -> str:
-        """Extract markdown from a document and save it to a file"""
+        """Extract markdown from a document and save it to a file (reusing a fresh earlier extraction)"""
+        
+        # The suggest and process steps both need markdown for the same uploads,
+        # so only the first one pays for parsing
+        cached = self.cached_markdown(file_path, output_dir)
+        if cached:
+            print(f"  📄 Using existing markdown: {cached}")
+            return cached
         
         if not self.use_landingai:
             raise ValueError("LandingAI API not available")
@@ -58,18 +95,18 @@ class DocumentExtractor:
             # Ensure output directory exists
             os.makedirs(output_dir, exist_ok=True)
             
-            # Use the LandingAI ADE client to parse the document
-            response = self.client.parse(
-                document=Path(file_path),
-                model="dpt-2-latest",
-            )
+            # Use the LandingAI ADE client to parse the document; the client is
+            # synchronous, so run it in a thread to let documents parse concurrently
+            async with self._parse_slots:
+                response = await asyncio.to_thread(
+                    self.client.parse,
+                    document=Path(file_path),
+                    model="dpt-2-latest",
+                )
 
             if response.markdown:
                 # Generate output filename based on input file
-                input_filename = os.path.basename(file_path)
-                base_name = os.path.splitext(input_filename)[0]
-                markdown_filename = f"{base_name}.md"
-                markdown_path = os.path.join(output_dir, markdown_filename)
+                markdown_path = self.markdown_path_for(file_path, output_dir)
                 
                 # Save markdown to file
                 with open(markdown_path, 'w', encoding='utf-8') as f:
@@ -91,11 +128,14 @@ class DocumentExtractor:
             raise ValueError("LandingAI API not available - configure API key for document extraction")
         
         try:
-            # Use the LandingAI ADE client to parse the document
-            response = self.client.parse(
-                document=Path(file_path),
-                model="dpt-2-latest",
-            )
+            # Use the LandingAI ADE client to parse the document; the client is
+            # synchronous, so run it in a thread to let documents parse concurrently
+            async with self._parse_slots:
+                response = await asyncio.to_thread(
+                    self.client.parse,
+                    document=Path(file_path),
+                    model="dpt-2-latest",
+                )
 
             if not response.markdown:
                 raise ValueError("No markdown content extracted from document")
@@ -112,21 +152,22 @@ class DocumentExtractor:
             else:
                 raise ValueError("Gemini API not available - configure API key for data parsing")
             
-            # Build ExtractionResult from parsed JSON
-            fields = [ExtractedField(**field) for field in result_json.get('extracted_fields', [])]
-            
+            # Build ExtractionResult from parsed JSON; pydantic validates the raw field
+            # dicts straight into ExtractedField dataclasses in one pass
             doc_type = self._map_document_type(result_json.get('document_type', 'unknown'))
             
-            return ExtractionResult(
+            result = ExtractionResult(
                 document_type=doc_type,
                 period=result_json.get('period', 'Unknown'),
-                extracted_fields=fields,
+                extracted_fields=result_json.get('extracted_fields', []),
                 metadata={
                     'source': 'landingai',
-                    'file': os.path.basename(file_path),
-                    'confidence_avg': sum(f.confidence for f in fields) / len(fields) if fields else 0
+                    'file': os.path.basename(file_path)
                 }
             )
+            fields = result.extracted_fields
+            result.metadata['confidence_avg'] = sum(f.confidence for f in fields) / len(fields) if fields else 0
+            return result
             
         except Exception as e:
             raise ValueError(f"Document extraction failed: {e}")
@@ -163,7 +204,6 @@ class DocumentExtractor:
         """
         
         # Use asyncio.to_thread to run the synchronous Gemini API call in a thread pool
-        import asyncio
         response = await asyncio.to_thread(self.gemini_model.generate_content, prompt)
         response_text = response.text
         
@@ -210,18 +250,11 @@ class DocumentExtractor:
             end = text.find('```', start)
             text = text[start:end]
         
-        return json.loads(text.strip())
+        return orjson.loads(text.strip())
     
-    def _map_document_type(self, doc_type_str: str) -> DocumentType:
-        """Map string to DocumentType enum"""
-        doc_type_map = {
-            'balance_sheet': DocumentType.BALANCE_SHEET,
-            'income_statement': DocumentType.INCOME_STATEMENT,
-            'profit_loss': DocumentType.INCOME_STATEMENT,
-            'p&l': DocumentType.INCOME_STATEMENT,
-            'cash_flow': DocumentType.CASH_FLOW,
-        }
-        return doc_type_map.get(doc_type_str.lower(), DocumentType.UNKNOWN)
+    def _map_document_type(self, doc_type_str: str) -> str:
+        """Map a model-reported document type to a DocumentType value"""
+        return _DOCUMENT_TYPE_MAP.get(doc_type_str.lower(), DocumentType.UNKNOWN.value)
     
     
     async def suggest_metrics_from_markdown(
@@ -259,7 +292,7 @@ class DocumentExtractor:
                 prompt = extraction_prompt(markdown_preview)
             
             print(f"  🤖 Calling Gemini AI to suggest metrics...")
-            response = self.gemini_model.generate_content(prompt)
+            response = await asyncio.to_thread(self.gemini_model.generate_content, prompt)
             
             # Extract JSON from response
             response_text = response.text.strip()
@@ -275,7 +308,7 @@ class DocumentExtractor:
                 response_text = response_text[start:end]
             
             # Parse JSON
-            suggestions = json.loads(response_text.strip())
+            suggestions = orjson.loads(response_text.strip())
             
             print(f"  ✅ Suggested {len(suggestions.get('suggested_metrics', []))} metrics")
             
@@ -338,8 +371,10 @@ class DocumentExtractor:
             print(f"  📋 Created schema with {len(metrics)} metrics")
             print(f"  🔍 Extracting metrics using LandingAI ADE...")
             
-            # Extract fields using LandingAI ADE
-            response = self.client.extract(
+            # Extract fields using LandingAI ADE; the client is synchronous, so run it
+            # in a thread to let the pipeline's per-document extractions overlap
+            response = await asyncio.to_thread(
+                self.client.extract,
                 schema=schema,
                 markdown=Path(markdown_path),
                 model=model
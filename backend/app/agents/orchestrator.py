@@ -1,42 +1,80 @@
 import asyncio
-from typing import TypedDict, List, Dict, Any
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from enum import IntEnum
+from typing import List, Dict, Any, Optional, Union, AsyncIterator
 from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
+from langgraph.checkpoint.memory import InMemorySaver
 from app.config import get_settings
 import traceback
 
-from app.models import (
-    ExtractionResult, 
-    FinancialInsight, 
-    DatabaseSchema,
-    DeploymentResult
-)
+from app.models import DatabaseSchema, DeploymentResult
 
 from app.agents.extractor import DocumentExtractor
 from app.agents.schema_designer import SchemaDesigner
 from app.agents.snowflake_deployer import SnowflakeDeployer
+from app.agents import state_store
 
 settings = get_settings()
 
+# Most failed runs kept for retries at once; the least recently used go first
+MAX_RETRY_THREADS = 128
+
 # --- METRIC EXTRACTION PIPELINE (FOR UI) ---
 
-class MetricState(TypedDict):
+class Branch(IntEnum):
+    """Graph branch, resolved once from current_step before the run"""
+    SUGGEST = 0
+    PROCESS = 1
+
+_BRANCH_MAP: Dict[str, Branch] = {
+    "suggest": Branch.SUGGEST,
+    "process": Branch.PROCESS,
+}
+
+@dataclass(slots=True)
+class MetricState:
     """
     State for the new UI-driven metric extraction pipeline.
     """
-    current_step: str
-    file_paths: List[str]
-    user_prompt: str
-    selected_metrics: List[Dict[str, Any]]
-    database_name: str
-    schema_name: str
-    markdown_paths: List[str]
-    suggested_metrics: List[Dict[str, Any]]
-    reasoning: str
-    schema: DatabaseSchema
-    deployment_result: DeploymentResult
-    extracted_metrics: Dict[str, Any]
-    extracted_metrics_by_document: Dict[str, Dict[str, Any]]  # ADD THIS
-    error: str
+    current_step: str = "suggest"
+    branch: Branch = Branch.SUGGEST  # Set by run() from current_step
+    file_paths: List[str] = field(default_factory=list)
+    user_prompt: str = ""
+    selected_metrics: List[Dict[str, Any]] = field(default_factory=list)
+    database_name: str = ""
+    schema_name: str = ""
+    markdown_paths: List[str] = field(default_factory=list)
+    suggested_metrics: List[Dict[str, Any]] = field(default_factory=list)
+    reasoning: str = ""
+    schema: Optional[DatabaseSchema] = None
+    deployment_result: Optional[DeploymentResult] = None
+    extracted_metrics: Dict[str, Any] = field(default_factory=dict)
+    extracted_metrics_by_document: Union[str, Dict[str, Dict[str, Any]]] = field(default_factory=dict)  # Inline dict, or state_store handle for large runs
+    schema_future_id: str = ""  # state_store handle of the in-flight schema design task
+    error: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow dict view, matching what LangGraph returns from ainvoke"""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MetricState":
+        """Build a state from a dict, ignoring unknown keys"""
+        return cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
+
+@dataclass(slots=True)
+class RetryThread:
+    """Checkpoint thread kept for a caller's retry_token"""
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    fingerprint: str = ""  # Inputs the checkpoints were made from
+    expires: float = 0.0  # time.monotonic() after which the thread may be evicted
 
 class MetricExtractionPipeline:
     """
@@ -49,26 +87,26 @@ class MetricExtractionPipeline:
         self.extractor = DocumentExtractor()
         self.designer = SchemaDesigner()
         self.deployer = SnowflakeDeployer()
+        # Keeps per-node checkpoints so a retried request resumes after the last finished node
+        self.checkpointer = InMemorySaver()
+        self.retry_threads: "OrderedDict[str, RetryThread]" = OrderedDict()
         self.app = self.build_graph()
 
     def build_graph(self):
         workflow = StateGraph(MetricState)
 
-        workflow.add_node("router", self.router_node)
         workflow.add_node("extract_markdown", self.extract_markdown_node)
         workflow.add_node("suggest_metrics", self.suggest_metrics_node)
         workflow.add_node("extract_metrics", self.extract_metrics_node)
         workflow.add_node("design_metrics_schema", self.design_metrics_schema_node)
         workflow.add_node("deploy_metrics", self.deploy_metrics_node)
 
-        workflow.set_entry_point("router")
-        
-        workflow.add_conditional_edges(
-            "router",
+        # Branch straight from START - no pass-through router node needed
+        workflow.set_conditional_entry_point(
             self.should_suggest_or_process,
             {
-                "suggest": "extract_markdown",
-                "process": "extract_metrics"
+                Branch.SUGGEST: "extract_markdown",
+                Branch.PROCESS: "extract_metrics"
             }
         )
         
@@ -79,39 +117,60 @@ class MetricExtractionPipeline:
         workflow.add_edge("design_metrics_schema", "deploy_metrics")
         workflow.add_edge("deploy_metrics", END)
 
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
 
-    async def router_node(self, state: MetricState) -> dict:
-        return {}
-    
-    def should_suggest_or_process(self, state: MetricState) -> str:
-        if state.get("current_step") == "process":
-            return "process"
-        return "suggest"
+    def should_suggest_or_process(self, state: MetricState) -> Branch:
+        return state.branch
 
     async def extract_markdown_node(self, state: MetricState) -> dict:
         print("--- (Metric Graph) 1a. Extracting Markdown ---")
-        markdown_paths = []
-        for file_path in state["file_paths"]:
-            md_path = await self.extractor.extract_markdown_from_document(
-                file_path, 
-                output_dir=settings.upload_dir
-            )
-            markdown_paths.append(md_path)
-        return {"markdown_paths": markdown_paths}
+        tasks = [
+            asyncio.create_task(self.extractor.extract_markdown_from_document(file_path, output_dir=settings.upload_dir))
+            for file_path in state.file_paths
+        ]
+        try:
+            markdown_paths = await asyncio.gather(*tasks)
+        finally:
+            # One failed or cancelled parse must not leave the others running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return {"markdown_paths": list(markdown_paths)}
 
     async def suggest_metrics_node(self, state: MetricState) -> dict:
         print("--- (Metric Graph) 1b. Suggesting Metrics ---")
-        markdown_paths_list = state["markdown_paths"]
+        markdown_paths_list = state.markdown_paths
         suggestions = await self.extractor.suggest_metrics_from_markdown(
             markdown_paths_list, 
-            state["user_prompt"]
+            state.user_prompt
         )
         return {
             "suggested_metrics": suggestions.get("suggested_metrics", []),
             "reasoning": suggestions.get("reasoning", "")
         }
 
+    @staticmethod
+    def _doc_name(md_path: str) -> str:
+        return md_path.replace('\\', '/').split('/')[-1].removesuffix('.md')
+
+    async def _extract_document(self, md_path: str, metrics: List[Dict[str, Any]], slots: asyncio.Semaphore) -> tuple:
+        """Extract metrics from a single markdown document, holding one of the run's extraction slots"""
+        doc_name = self._doc_name(md_path)
+        
+        async with slots:
+            print(f"  🔍 Extracting from: {doc_name}")
+            extraction_data = await self.extractor.extract_metrics_from_markdown(
+                markdown_path=md_path,
+                metrics=metrics
+            )
+        
+        if "error" not in extraction_data and extraction_data.get("extraction"):
+            print(f"  ✅ Extracted {len(extraction_data['extraction'])} metrics from {doc_name}")
+            return doc_name, extraction_data["extraction"]
+        
+        print(f"  ⚠️  Failed to extract from {doc_name}")
+        return doc_name, {}
+
     async def extract_metrics_node(self, state: MetricState) -> dict:
         """
         Extract metrics from ALL documents at once.
@@ -119,59 +178,100 @@ class MetricExtractionPipeline:
         """
         print("--- (Metric Graph) 2a. Extracting Metrics ---")
         
-        extracted_metrics_by_document = {}
+        metrics = state.selected_metrics  # ALWAYS use the same metrics
+        markdown_paths = state.markdown_paths
         
-        # Extract from ALL documents using the SAME selected_metrics
-        for md_path in state["markdown_paths"]:
-            doc_name = md_path.replace('\\', '/').split('/')[-1].replace('.md', '')
-            
-            print(f"  🔍 Extracting from: {doc_name}")
-            extraction_data = await self.extractor.extract_metrics_from_markdown(
-                markdown_path=md_path,
-                metrics=state["selected_metrics"]  # ALWAYS use the same metrics
-            )
-            
-            if "error" not in extraction_data and extraction_data.get("extraction"):
-                extracted_metrics_by_document[doc_name] = extraction_data["extraction"]
-                print(f"  ✅ Extracted {len(extraction_data['extraction'])} metrics from {doc_name}")
-            else:
-                print(f"  ⚠️  Failed to extract from {doc_name}")
-                extracted_metrics_by_document[doc_name] = {}
+        # Extract from ALL documents using the SAME selected_metrics, at most
+        # EXTRACT_CONCURRENCY at a time so large runs don't flood the LLM APIs
+        slots = asyncio.Semaphore(settings.extract_concurrency)
+        tasks = [
+            asyncio.create_task(self._extract_document(md_path, metrics, slots))
+            for md_path in markdown_paths
+        ]
+        
+        # Partial results go to run_stream() listeners; a no-op under ainvoke
+        write_partial = get_stream_writer()
+        
+        results = {}
+        schema_task = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                doc_name, doc_metrics = await next_done
+                results[doc_name] = doc_metrics
+                write_partial({"document": doc_name, "metrics": doc_metrics})
+                
+                # The schema only needs the metric shape, so start designing it
+                # as soon as the first document lands and overlap it with the rest
+                if schema_task is None:
+                    schema_task = asyncio.create_task(
+                        self.designer.design_schema(extracted_metrics=doc_metrics, metrics=metrics)
+                    )
+        except BaseException:
+            # A failed document or a cancelled run (e.g. the request timed out) must
+            # not leave the schema design running with nobody to collect it
+            if schema_task is not None:
+                schema_task.cancel()
+                tasks.append(schema_task)
+            raise
+        finally:
+            # Stop the extractions still in flight and retrieve every outcome,
+            # so no task keeps spending API quota or dies with an unseen exception
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # Keep input order so the "first document" stays deterministic
+        extracted_metrics_by_document = {
+            doc_name: results[doc_name]
+            for doc_name in map(self._doc_name, markdown_paths)
+        }
         
         # For backwards compatibility, store first document's metrics
         first_doc_metrics = {}
         if extracted_metrics_by_document:
             first_doc_metrics = list(extracted_metrics_by_document.values())[0]
         
+        # Keep large payloads out of the graph state - pass a handle instead
+        by_document = extracted_metrics_by_document
+        if len(extracted_metrics_by_document) > state_store.INLINE_THRESHOLD:
+            by_document = state_store.put(extracted_metrics_by_document)
+        
         return {
             "extracted_metrics": first_doc_metrics,  # Legacy
-            "extracted_metrics_by_document": extracted_metrics_by_document  # New
+            "extracted_metrics_by_document": by_document,  # New
+            "schema_future_id": state_store.put(schema_task) if schema_task else ""
         }
 
     async def design_metrics_schema_node(self, state: MetricState) -> dict:
         print("--- (Metric Graph) 2b. Designing Schema ---")
         
+        # Usually already started by extract_metrics_node - just collect it
+        schema_future_id = state.schema_future_id
+        schema_future = state_store.pop(schema_future_id) if schema_future_id else None
+        if schema_future is not None:
+            return {"schema": await schema_future}
+        
         # Get first document's metrics for schema design (or empty dict if none)
-        first_doc_metrics = state.get("extracted_metrics", {})
+        first_doc_metrics = state.extracted_metrics
         
         db_schema = await self.designer.design_schema(
             extracted_metrics=first_doc_metrics,
-            metrics=state["selected_metrics"]  # ALWAYS use selected_metrics
+            metrics=state.selected_metrics  # ALWAYS use selected_metrics
         )
         return {"schema": db_schema}
 
     async def deploy_metrics_node(self, state: MetricState) -> dict:
         """
-        Deploy schema once, then insert each document as a separate row.
-        CRITICAL: Use only the metrics from state["selected_metrics"]
+        Deploy schema once, then insert one row per document in a single batch.
+        CRITICAL: Use only the metrics from state.selected_metrics
         """
         print("--- (Metric Graph) 2c. Deploying Metrics ---")
         
-        total_rows_loaded = 0
         final_deployment_result = None
         
         # Get the extracted metrics that were already extracted in extract_metrics_node
-        extracted_metrics_by_document = state.get("extracted_metrics_by_document", {})
+        by_document = state.extracted_metrics_by_document
+        extracted_metrics_by_document = state_store.resolve(by_document)
         
         if not extracted_metrics_by_document:
             print("  ⚠️  No metrics extracted, skipping deployment")
@@ -181,30 +281,26 @@ class MetricExtractionPipeline:
                 "extracted_metrics_by_document": {}
             }
         
-        # Step 1: Create schema ONCE using the selected_metrics
+        # Step 1: Create schema ONCE using the schema designed from selected_metrics
         first_doc_metrics = list(extracted_metrics_by_document.values())[0]
         
-        schema_result = await self.designer.design_schema(
-            extracted_metrics=first_doc_metrics,
-            metrics=state["selected_metrics"]  # Use selected_metrics for schema
-        )
+        schema_result = state.schema
+        if schema_result is None:
+            schema_result = await self.designer.design_schema(
+                extracted_metrics=first_doc_metrics,
+                metrics=state.selected_metrics  # Use selected_metrics for schema
+            )
         
         schema_deployment = await self.deployer.create_schema_if_not_exists(schema_result)
         print(f"  ✅ Schema created: {schema_deployment.tables_created} tables")
         
         final_deployment_result = schema_deployment
         
-        # Step 2: Insert each document's extracted metrics
-        for doc_name, doc_metrics in extracted_metrics_by_document.items():
-            print(f"  📊 Inserting metrics for: {doc_name}")
-            
-            # Insert using the SAME selected_metrics list
-            rows_inserted = await self.deployer.insert_metrics_row(
-                extracted_metrics=doc_metrics,
-                metrics=state["selected_metrics"],  # CRITICAL: Use selected_metrics
-                document_name=doc_name
-            )
-            total_rows_loaded += rows_inserted
+        # Step 2: Insert every document's extracted metrics in one batch
+        total_rows_loaded = await self.deployer.insert_metrics_rows(
+            extracted_metrics_by_document,
+            metrics=state.selected_metrics  # CRITICAL: Use selected_metrics
+        )
         
         # Update deployment result
         if final_deployment_result:
@@ -216,16 +312,156 @@ class MetricExtractionPipeline:
         return {
             "deployment_result": final_deployment_result,
             "extracted_metrics": first_doc_metrics,
-            "extracted_metrics_by_document": extracted_metrics_by_document
+            "extracted_metrics_by_document": by_document
         }
 
-    async def run(self, state: MetricState) -> MetricState:
+    @staticmethod
+    def _fingerprint(state: MetricState) -> str:
+        """Hash of a run's inputs, including the size and mtime of every file it reads"""
+        files = []
+        for path in (*state.file_paths, *state.markdown_paths):
+            try:
+                stat = os.stat(path)
+                files.append((path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                files.append((path, None, None))
+        key = json.dumps([
+            state.branch, files, state.user_prompt,
+            state.selected_metrics, state.database_name, state.schema_name
+        ], sort_keys=True, default=str)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    async def _drop_thread(self, thread_id: str, release: bool = True) -> None:
+        """Delete a thread's checkpoints, first releasing the state_store entries its state still holds"""
+        if release:
+            values = (await self.app.aget_state({"configurable": {"thread_id": thread_id}})).values
+            by_document = values.get("extracted_metrics_by_document")
+            if state_store.is_handle(by_document):
+                state_store.pop(by_document)
+            schema_future = state_store.pop(values.get("schema_future_id") or "")
+            if schema_future is not None:
+                schema_future.cancel()
+        await self.checkpointer.adelete_thread(thread_id)
+
+    async def _cancel_schema_task(self, thread_id: str) -> None:
+        """Cancel a pre-started schema task the thread's state still holds; a resume redesigns it"""
+        values = (await self.app.aget_state({"configurable": {"thread_id": thread_id}})).values
+        schema_future = state_store.pop(values.get("schema_future_id") or "")
+        if schema_future is not None:
+            schema_future.cancel()
+
+    async def _evict_retry_threads(self) -> None:
+        """Drop expired retry threads, and the least recently used beyond MAX_RETRY_THREADS"""
+        now = time.monotonic()
+        overflow = len(self.retry_threads) - MAX_RETRY_THREADS
+        for token, entry in list(self.retry_threads.items()):
+            if entry.lock.locked():
+                continue
+            if overflow > 0 or entry.expires <= now:
+                overflow -= 1
+                if self.retry_threads.pop(token, None) is entry:
+                    await self._drop_thread(f"retry-{token}")
+
+    async def _run_thread(self, thread_id: str, state: MetricState, keep_failed: bool) -> Dict[str, Any]:
+        """Run (or resume) the graph on one checkpoint thread"""
+        config = {"configurable": {"thread_id": thread_id}}
+        try:
+            snapshot = await self.app.aget_state(config)
+            if snapshot.next:
+                print(f"--- (Metric Graph) Resuming at {', '.join(snapshot.next)} ---")
+                result = await self.app.ainvoke(None, config)
+            else:
+                result = await self.app.ainvoke(state, config)
+        except asyncio.CancelledError:
+            # Timed out or aborted: LangGraph has cancelled the running node (which
+            # cancels its own tasks). A retryable run keeps its finished checkpoints;
+            # otherwise free them and anything they still hold
+            if keep_failed:
+                await self._cancel_schema_task(thread_id)
+            else:
+                await self._drop_thread(thread_id)
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            if not keep_failed:
+                await self._drop_thread(thread_id)
+            state.error = str(e)
+            return state.to_dict()
+        # Handles in the result now belong to the caller
+        await self._drop_thread(thread_id, release=False)
+        return result
+
+    async def run(self, state: MetricState, retry_token: Optional[str] = None) -> Dict[str, Any]:
         """
         Runs the appropriate branch of the graph.
+        
+        With a retry_token, a failed run's checkpoints are kept for CHECKPOINT_TTL
+        seconds; calling again with the same token and unchanged inputs resumes
+        after the last node that finished instead of starting over.
         """
+        state.branch = _BRANCH_MAP.get(state.current_step, Branch.SUGGEST)
+        if not retry_token:
+            return await self._run_thread(uuid.uuid4().hex, state, keep_failed=False)
+        
+        await self._evict_retry_threads()
+        entry = self.retry_threads.get(retry_token)
+        if entry is None:
+            entry = self.retry_threads[retry_token] = RetryThread()
+        self.retry_threads.move_to_end(retry_token)
+        
+        # Concurrent calls with the same token run one after another, never on the thread at once
+        async with entry.lock:
+            thread_id = f"retry-{retry_token}"
+            fingerprint = await asyncio.to_thread(self._fingerprint, state)
+            if entry.fingerprint != fingerprint:
+                # First attempt, or the inputs changed (e.g. a file was re-uploaded) - start over
+                await self._drop_thread(thread_id)
+                entry.fingerprint = fingerprint
+            
+            try:
+                result = await self._run_thread(thread_id, state, keep_failed=True)
+            except asyncio.CancelledError:
+                # e.g. the request timed out - keep the checkpoints for a retry until the TTL
+                entry.expires = time.monotonic() + settings.checkpoint_ttl
+                raise
+            if result.get("error"):
+                entry.expires = time.monotonic() + settings.checkpoint_ttl
+            elif self.retry_threads.get(retry_token) is entry:
+                del self.retry_threads[retry_token]
+            return result
+
+    async def run_stream(self, state: MetricState) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Runs the appropriate branch of the graph, yielding each node's update
+        (and each document's metrics as soon as it is extracted) as it happens.
+        """
+        state.branch = _BRANCH_MAP.get(state.current_step, Branch.SUGGEST)
+        handles = set()
+        thread_id = uuid.uuid4().hex
+        config = {"configurable": {"thread_id": thread_id}}
+        completed = False
         try:
-            return await self.app.ainvoke(state)
+            async for mode, chunk in self.app.astream(state, config, stream_mode=["updates", "custom"]):
+                if mode == "custom":
+                    yield {"event": "partial", "data": chunk}
+                    continue
+                
+                for node_name, update in chunk.items():
+                    update = dict(update or {})
+                    update.pop("schema_future_id", None)
+                    by_document = update.get("extracted_metrics_by_document")
+                    if state_store.is_handle(by_document):
+                        handles.add(by_document)
+                        update["extracted_metrics_by_document"] = state_store.get(by_document)
+                    yield {"event": node_name, "data": update}
+            
+            completed = True
+            yield {"event": "done", "data": {"success": True}}
         except Exception as e:
             traceback.print_exc()
-            state["error"] = str(e)
-            return state
\ No newline at end of file
+            yield {"event": "error", "data": {"error": str(e)}}
+        finally:
+            # A failed or abandoned stream may still hold a pre-started schema task
+            await self._drop_thread(thread_id, release=not completed)
+            for handle in handles:
+                state_store.pop(handle)
@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class SnowflakePool:
+    """Small thread-safe pool of Snowflake connections"""
+    
+    def __init__(self, connect: Callable[[], Any], size: int, validate_after: float = 60.0):
+        self._connect = connect
+        # LIFO so the most recently used (warmest) connection is handed out first
+        self._idle: "queue.LifoQueue[Tuple[Any, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._validate_after = validate_after
+        self._size = size
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._opened = 0
+    
+    def _is_usable(self, conn: Any, last_used: float) -> bool:
+        """Check an idle connection; only round-trip a SELECT 1 if it sat idle a while"""
+        if conn.is_closed():
+            return False
+        if time.monotonic() - last_used < self._validate_after:
+            return True
+        try:
+            conn.cursor().execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+    
+    def acquire(self) -> Any:
+        """Take a connection, opening a new one if none are idle (blocks when the pool is exhausted)"""
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._connect()
+                    with self._lock:
+                        self._opened += 1
+                    break
+                if self._is_usable(conn, last_used):
+                    break
+                _close_quietly(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+        return conn
+    
+    def release(self, conn: Any) -> None:
+        """Return a healthy connection to the pool"""
+        self._idle.put((conn, time.monotonic()))
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+    
+    def discard(self, conn: Any) -> None:
+        """Close a broken connection instead of returning it"""
+        _close_quietly(conn)
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Pool size and current usage, for health checks"""
+        with self._lock:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "opened": self._opened
+            }
+    
+    def close(self) -> None:
+        """Close all idle connections"""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close_quietly(conn)
@@ -0,0 +1,39 @@
+import uuid
+from typing import Any, Dict
+
+# Process-local store for large payloads referenced from LangGraph state.
+# Nodes put the payload here and pass the returned key through the graph,
+# so the state itself only carries a short string.
+_store: Dict[str, Any] = {}
+
+# Below this many documents the payload is small enough to keep inline
+INLINE_THRESHOLD = 20
+
+
+def put(obj: Any) -> str:
+    """Store an object and return its handle"""
+    key = uuid.uuid4().hex
+    _store[key] = obj
+    return key
+
+
+def get(key: str) -> Any:
+    """Fetch an object by handle"""
+    return _store[key]
+
+
+def pop(key: str, default: Any = None) -> Any:
+    """Remove an object by handle and return it"""
+    return _store.pop(key, default)
+
+
+def is_handle(value: Any) -> bool:
+    """Check whether a state value is a handle into the store"""
+    return isinstance(value, str) and value in _store
+
+
+def resolve(value: Any) -> Any:
+    """Return the stored object for a handle, or the value itself if inline"""
+    if is_handle(value):
+        return _store[value]
+    return value
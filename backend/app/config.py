@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 from pathlib import Path
+from typing import List
 
 # Determine the project root directory (2 levels up from backend/app/config.py)
 # This ensures we find .env at the project root regardless of working directory
@@ -22,11 +23,25 @@ class Settings(BaseSettings):
     snowflake_database: str = "FINANCIAL_DATA"
     snowflake_schema: str = "PUBLIC"
     snowflake_role: str = "ACCOUNTADMIN"
+    schema_ready_ttl: int = 300  # Seconds to trust a previous schema deployment before re-running DDL
+    bulk_load_threshold: int = 500  # Row count at which loads switch from INSERT binding to PUT + COPY
+    stage_file_rows: int = 100000  # Rows per staged file; larger loads are split and uploaded in parallel
+    snowflake_pool_size: int = 4  # Max concurrent Snowflake connections held by the deployer
+    snowflake_pool_validate_after: int = 60  # Seconds idle before a pooled connection is re-checked
+    eager_init: bool = True  # Build the pipeline at startup; off defers LangGraph/SDK imports to the first request
+    warmup_on_start: bool = True  # Open a Snowflake connection and ensure the database/schema at startup
+    
+    extract_concurrency: int = 8  # Documents parsed by LandingAI at once
+    pipeline_timeout: int = 300  # Seconds a /api/process run may take before it is cancelled
+    checkpoint_ttl: int = 900  # Seconds a failed run's checkpoints are kept for a retry with the same retry_token
     
     # Application
     environment: str = "development"
     debug: bool = True
     upload_dir: str = "./uploads"
+    max_upload_mb: int = 50  # Per-file upload cap; larger files get a 413
+    max_upload_request_mb: int = 200  # Cap on a whole /api/upload body, checked from Content-Length before parsing
+    cors_origins: List[str] = ["http://localhost:5173"]  # Frontend origins allowed to call the API (JSON list in env)
     
     model_config = SettingsConfigDict(
         env_file=str(ENV_FILE) if ENV_FILE.exists() else ".env",
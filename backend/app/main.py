@@ -1,46 +1,188 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+from pydantic import BaseModel, TypeAdapter
+import asyncio
+import io
 import os
+import orjson
 import shutil
+import sys
+import tempfile
+import uuid
 from pathlib import Path
-import traceback
-from datetime import time  # <-- Keep this import
-import time # <-- Import the time module
-from app.agents.orchestrator import MetricExtractionPipeline, MetricState
-from app.agents.extractor import DocumentExtractor
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import time
+from collections import deque
+from decimal import Decimal
+from app.agents import state_store
 from app.models import ProcessRequest, ProcessResponse, MetricDefinition
 from app.config import get_settings
 
+# The orchestrator pulls in LangGraph, LandingAI and Gemini - imported on first use, not at module load
+if TYPE_CHECKING:
+    from app.agents.orchestrator import MetricState
+
 app = FastAPI(title="FinanceFlow AI", version="1.0.0")
 
-# CORS Configuration
+# Get settings
+settings = get_settings()
+
+class UploadSizeLimit:
+    """Reject an oversized /api/upload from its Content-Length, before the multipart body is read"""
+    
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/api/upload":
+            content_length = dict(scope["headers"]).get(b"content-length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+                response = JSONResponse(
+                    {"detail": f"Upload too large (max {settings.max_upload_request_mb} MB per request)"},
+                    status_code=413
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+# Innermost of the three, so a 413 still gets CORS headers the browser can read
+app.add_middleware(UploadSizeLimit, max_bytes=settings.max_upload_request_mb * 1024 * 1024)
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """GZip that never touches the SSE route - older Starlette releases would buffer its frames"""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/api/process/stream":
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress large JSON bodies (ProcessResponse is highly repetitive); SSE streams are left alone.
+# Added before CORS so CORS stays the outermost middleware
+app.add_middleware(JSONGZipMiddleware, minimum_size=2048, compresslevel=4)
+
+# CORS Configuration - pinned origins and a narrow method/header list; browsers
+# cache the preflight for a day so repeat POSTs skip the OPTIONS round trip
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=settings.cors_origins,
+    allow_credentials=False,
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type", "authorization"],
+    max_age=86400,
 )
 
-# Get settings
-settings = get_settings()
+# app.* loggers hand records to a queue; a background listener does the actual
+# stream writes so request handlers never block on stdout
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = QueueListener(log_queue, log_handler)
+app_logger = logging.getLogger("app")
+app_logger.addHandler(QueueHandler(log_queue))
+app_logger.setLevel(logging.INFO)
+app_logger.propagate = False
+
+logger = logging.getLogger(__name__)
 
 # Upload directory
 UPLOAD_DIR = Path(settings.upload_dir)
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+UPLOAD_CONCURRENCY = 8  # Files written at once per upload request
+MAX_UPLOAD_BYTES = settings.max_upload_mb * 1024 * 1024
+# Only Linux sendfile accepts a regular file as the destination (macOS/BSD need a socket);
+# same check shutil uses for its own fast copy
+USE_SENDFILE = hasattr(os, "sendfile") and sys.platform.startswith("linux")
+
+def same_content(src, file_path: Path, size: int) -> bool:
+    """Whether file_path already holds exactly the bytes of the spooled upload"""
+    try:
+        if os.path.getsize(file_path) != size:
+            return False
+        with open(file_path, "rb") as existing:
+            src.seek(0)
+            while chunk := src.read(UPLOAD_CHUNK_SIZE):
+                if existing.read(len(chunk)) != chunk:
+                    return False
+        return True
+    except OSError:
+        return False
+    finally:
+        src.seek(0)
+
+def disk_fileno(src) -> Optional[int]:
+    """The OS file descriptor behind an upload, or None while it is still only in memory"""
+    # A SpooledTemporaryFile has no name until it rolls over to a real file, and
+    # calling fileno() before that would force the rollover
+    if isinstance(src, tempfile.SpooledTemporaryFile) and src.name is None:
+        return None
+    try:
+        return src.fileno()
+    except (io.UnsupportedOperation, AttributeError, OSError):
+        return None
+
+def write_upload(src, file_path: Path) -> None:
+    """
+    Copy a spooled upload into place. Uploads Starlette has rolled to disk are
+    copied kernel-to-kernel with sendfile on Linux; small in-memory spools are copied directly.
+    Re-uploading identical content leaves the existing file (and its mtime, which
+    keeps the saved markdown valid) untouched.
+    """
+    src.seek(0, os.SEEK_END)
+    size = src.tell()
+    if same_content(src, file_path, size):
+        return
+    
+    # Write beside the target and swap it in, so concurrent uploads of the same
+    # name never interleave and readers never see a half-written file
+    tmp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.part")
+    src_fd = disk_fileno(src) if USE_SENDFILE else None
+    try:
+        with open(tmp_path, "wb") as dest:
+            if src_fd is None:
+                shutil.copyfileobj(src, dest, UPLOAD_CHUNK_SIZE)
+            else:
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(dest.fileno(), src_fd, offset, size - offset)
+                    if not sent:
+                        break
+                    offset += sent
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
-# Initialize pipelines
-finance_pipeline = None
+# Initialize pipeline
 metric_pipeline = None
 
+# Set once startup has built the pipeline and warmed Snowflake; /health reports it
+pipeline_ready = False
+
 # Analysis agent (lazy initialization)
 analysis_agent = None
 
-# --- NEW: In-memory store for logs ---
-# This list will store your logs
-logs_store: List[Dict[str, Any]] = []
-# --- END NEW ---
+# In-memory store for logs - the last 1000 entries, oldest evicted in O(1)
+logs_store: "deque[Dict[str, Any]]" = deque(maxlen=1000)
+
+def orjson_default(obj: Any) -> Any:
+    """orjson fallback for pydantic models in graph updates and Snowflake NUMBER values"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def json_response(content: Any) -> Response:
+    """Serialize a plain dict response with orjson instead of jsonable_encoder + json"""
+    return Response(content=orjson.dumps(content, default=orjson_default), media_type="application/json")
 
 def get_analysis_agent():
     """Lazy initialization of analysis agent"""
@@ -59,10 +201,9 @@ async def analyze_query(request: Dict[str, Any]):
             user_query=request.get("query", ""),
             conversation_history=request.get("conversation_history", [])
         )
-        return result
+        return json_response(result)
     except Exception as e:
-        print(f"Analysis error: {e}")
-        traceback.print_exc()
+        logger.exception("Analysis error")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @app.get("/api/analysis/metadata")
@@ -71,17 +212,18 @@ async def get_analysis_metadata():
     try:
         agent = get_analysis_agent()
         metadata = await agent.get_available_data()
-        return metadata
+        return json_response(metadata)
     except Exception as e:
-        print(f"Metadata error: {e}")
+        logger.exception("Metadata error")
         raise HTTPException(status_code=500, detail=f"Failed to fetch metadata: {str(e)}")
 
 def get_pipeline():
-    """Lazy initialization of LangGraph pipelines"""
-    global finance_pipeline, metric_pipeline
+    """Lazy initialization of LangGraph pipeline"""
+    global metric_pipeline
     
-    if finance_pipeline is None:
+    if metric_pipeline is None:
         print("\n🚀 Initializing LangGraph Pipeline...")
+        from app.agents.orchestrator import MetricExtractionPipeline
         metric_pipeline = MetricExtractionPipeline()
         print("✅ Pipeline initialized\n")
     
@@ -90,13 +232,30 @@ def get_pipeline():
 @app.on_event("startup")
 async def startup_event():
     """Initialize on startup"""
+    global pipeline_ready
+    log_listener.start()
     print("\n" + "="*60)
     print("🚀 FinanceFlow AI Backend Starting...")
     print("="*60 + "\n")
-    get_pipeline()
+    if settings.eager_init:
+        pipeline = get_pipeline()
+        if settings.warmup_on_start:
+            # Pay the Snowflake handshake and database setup now, not on the first request
+            try:
+                await pipeline.deployer.warmup()
+            except Exception as e:
+                print(f"⚠️  Snowflake warmup failed: {e}")
+    pipeline_ready = True
     print("✅ Backend ready at http://localhost:8000")
     print("📚 API Docs at http://localhost:8000/docs\n")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled Snowflake connections and flush queued logs on shutdown"""
+    if metric_pipeline is not None:
+        metric_pipeline.deployer.close()
+    log_listener.stop()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -108,43 +267,67 @@ async def root():
 
 @app.get("/health")
 async def health():
-    """Detailed health check"""
-    met_pipe = get_pipeline()
+    """Readiness check - never triggers pipeline initialization itself"""
+    if not pipeline_ready:
+        return {
+            "status": "starting",
+            "pipelines": {
+                "metric_pipeline": "initializing"
+            }
+        }
+    if metric_pipeline is None:
+        # EAGER_INIT is off - the pipeline is built by the first request that needs it
+        return {
+            "status": "healthy",
+            "pipelines": {
+                "metric_pipeline": "lazy"
+            }
+        }
     return {
         "status": "healthy",
         "pipelines": {
-            "finance_pipeline": "ready",
             "metric_pipeline": "ready"
-        }
+        },
+        "snowflake_pool": metric_pipeline.deployer.pool_stats()
     }
 
 @app.post("/api/upload")
 async def upload_files(files: List[UploadFile] = File(...)):
     """Upload financial documents"""
-    print(f"\n{'='*60}")
-    print(f"📤 UPLOAD REQUEST")
-    print(f"{'='*60}")
-    print(f"Received {len(files)} file(s)")
+    logger.info("📤 Upload request: %d file(s)", len(files))
     
-    uploaded_files = []
+    # Starlette has only spooled the parts so far - refuse before anything lands in the upload dir
+    oversized = [file.filename for file in files if file.size is not None and file.size > MAX_UPLOAD_BYTES]
+    if oversized:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large (max {settings.max_upload_mb} MB): {', '.join(oversized)}"
+        )
     
-    for file in files:
-        try:
-            file_path = UPLOAD_DIR / file.filename
-            
-            print(f"  📄 {file.filename} ({file.content_type})")
-            
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            uploaded_files.append(str(file_path))
-            print(f"  ✅ Saved to: {file_path}")
-            
-        except Exception as e:
-            print(f"  ❌ Error saving {file.filename}: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to save {file.filename}: {str(e)}")
+    # Bounded so a large batch doesn't exhaust file descriptors
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
     
-    print(f"\n✅ Upload complete: {len(uploaded_files)} files saved\n")
+    async def save(file: UploadFile) -> str:
+        async with semaphore:
+            try:
+                # Keep only the base name so a crafted filename can't escape the upload dir
+                file_path = UPLOAD_DIR / Path(file.filename).name
+                
+                logger.debug("  📄 %s (%s)", file.filename, file.content_type)
+                
+                # The upload is already spooled; copy it without pulling it through Python bytes
+                await asyncio.to_thread(write_upload, file.file, file_path)
+                
+                logger.debug("  ✅ Saved to: %s", file_path)
+                return str(file_path)
+                
+            except Exception as e:
+                logger.exception("  ❌ Error saving %s", file.filename)
+                raise HTTPException(status_code=500, detail=f"Failed to save {file.filename}: {str(e)}")
+    
+    uploaded_files = await asyncio.gather(*(save(file) for file in files))
+    
+    logger.info("✅ Upload complete: %d files saved", len(uploaded_files))
     
     return {
         "message": f"Successfully uploaded {len(uploaded_files)} file(s)",
@@ -152,96 +335,119 @@ async def upload_files(files: List[UploadFile] = File(...)):
     }
 
 
+# Keys the pipeline reads from each selected metric
+METRIC_FIELDS = {"name", "type", "description"}
+
+# Validator for the suggested-metric list, compiled once at import
+METRIC_LIST = TypeAdapter(List[MetricDefinition])
+
+def missing_files(file_paths: List[str]) -> List[str]:
+    """
+    Paths that don't exist. One directory listing answers most checks; only
+    paths outside the upload dir fall back to a stat each.
+    """
+    with os.scandir(UPLOAD_DIR) as entries:
+        uploaded = {os.path.abspath(entry.path) for entry in entries}
+    return [
+        file_path for file_path in file_paths
+        if os.path.abspath(file_path) not in uploaded and not os.path.exists(file_path)
+    ]
+
+
+async def build_initial_state(request: ProcessRequest) -> "MetricState":
+    """Validate the request and build the initial MetricExtractionPipeline state"""
+    # A re-submitted path would otherwise be parsed and extracted twice; keep first-seen order
+    file_paths = list(dict.fromkeys(request.file_paths))
+    
+    # Validate file paths - the directory listing and stats run in a thread, off the event loop
+    missing = await asyncio.to_thread(missing_files, file_paths)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"File not found: {', '.join(missing)}")
+    
+    # Determine workflow: if selected_metrics provided, use "process" branch, else "suggest" branch
+    has_selected_metrics = request.selected_metrics and len(request.selected_metrics) > 0
+    current_step = "process" if has_selected_metrics else "suggest"
+    
+    # Convert MetricDefinition to dict for pipeline (serialized by pydantic-core).
+    # Frozen metrics hash by value, so a metric sent twice is converted (and becomes a column) once
+    selected_metrics_dict = []
+    if request.selected_metrics:
+        selected_metrics_dict = [
+            metric.model_dump(include=METRIC_FIELDS)
+            for metric in dict.fromkeys(request.selected_metrics)
+        ]
+    
+    # For process step, get markdown paths (use existing files or extract if needed)
+    markdown_paths = []
+    if current_step == "process" and file_paths:
+    
+        # Reuse the pipeline's extractor instead of re-initializing LandingAI/Gemini clients per request
+        extractor = get_pipeline().extractor
+    
+        # Extract all documents concurrently; the extractor bounds how many parse at once
+        # and reuses markdown saved by an earlier suggest step unless the upload changed since
+        results = await asyncio.gather(
+            *(
+                extractor.extract_markdown_from_document(file_path=file_path, output_dir=settings.upload_dir)
+                for file_path in file_paths
+            ),
+            return_exceptions=True
+        )
+        for file_path, result in zip(file_paths, results):
+            if isinstance(result, Exception):
+                logger.warning("  ⚠️  Error extracting markdown from %s: %s", file_path, result)
+                # Continue with other files
+            else:
+                markdown_paths.append(result)
+    
+        logger.info("  ✅ Ready to process %d markdown file(s)", len(markdown_paths))
+    
+    # Prepare initial state for MetricExtractionPipeline
+    from app.agents.orchestrator import MetricState
+    initial_state = MetricState(
+        current_step=current_step,
+        file_paths=file_paths if current_step == "suggest" else [],
+        markdown_paths=markdown_paths if current_step == "process" else [],  # Will be populated by suggest step
+        user_prompt=request.user_prompt or "",
+        selected_metrics=selected_metrics_dict,
+        database_name=settings.snowflake_database,
+        schema_name=settings.snowflake_schema,
+    )
+    
+    return initial_state
+
+
 @app.post("/api/process", response_model=ProcessResponse)
 async def process_documents(request: ProcessRequest):
     """Process uploaded financial documents through LangGraph MetricExtractionPipeline"""
     
-    print(f"\n{'='*60}")
-    print(f"🔄 PROCESSING REQUEST (MetricExtractionPipeline)")
-    print(f"{'='*60}")
-    print(f"Files to process: {len(request.file_paths)}")
-    for path in request.file_paths:
-        print(f"  - {path}")
-    print(f"Selected metrics: {len(request.selected_metrics) if request.selected_metrics else 0}")
-    print()
+    logger.info(
+        "🔄 Processing request: %d file(s), %d selected metric(s)",
+        len(request.file_paths),
+        len(request.selected_metrics) if request.selected_metrics else 0
+    )
+    if logger.isEnabledFor(logging.DEBUG):
+        for path in request.file_paths:
+            logger.debug("  - %s", path)
     
     try:
-        # Validate file paths
-        for file_path in request.file_paths:
-            if not os.path.exists(file_path):
-                raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
-        
         # Get pipeline
         metric_pipe = get_pipeline()
         
-        # Determine workflow: if selected_metrics provided, use "process" branch, else "suggest" branch
-        has_selected_metrics = request.selected_metrics and len(request.selected_metrics) > 0
-        current_step = "process" if has_selected_metrics else "suggest"
-        
-        # Convert MetricDefinition to dict for pipeline
-        selected_metrics_dict = []
-        if request.selected_metrics:
-            selected_metrics_dict = [
-                {
-                    "name": metric.name,
-                    "type": metric.type,
-                    "description": metric.description
-                }
-                for metric in request.selected_metrics
-            ]
-        
-        # For process step, get markdown paths (use existing files or extract if needed)
-        markdown_paths = []
-        if current_step == "process" and request.file_paths:
-
-            extractor = DocumentExtractor()
+        async def run_pipeline():
+            # Markdown parsing in build_initial_state is network-bound too, so it counts against the timeout
+            initial_state = await build_initial_state(request)
             
-            for file_path in request.file_paths:
-                # Check if markdown file already exists
-                input_filename = os.path.basename(file_path)
-                base_name = os.path.splitext(input_filename)[0]
-                expected_md_path = os.path.join(settings.upload_dir, f"{base_name}.md")
-                
-                if os.path.exists(expected_md_path):
-                    print(f"  📄 Using existing markdown: {expected_md_path}")
-                    markdown_paths.append(expected_md_path)
-                else:
-                    print(f"  📄 Extracting markdown from: {file_path}")
-                    try:
-                        md_path = await extractor.extract_markdown_from_document(
-                            file_path=file_path,
-                            output_dir=settings.upload_dir
-                        )
-                        markdown_paths.append(md_path)
-                    except Exception as e:
-                        print(f"  ⚠️  Error extracting markdown from {file_path}: {e}")
-                        # Continue with other files
-            
-            print(f"  ✅ Ready to process {len(markdown_paths)} markdown file(s)")
-        
-        # Prepare initial state for MetricExtractionPipeline
-        initial_state: MetricState = {
-            "current_step": current_step,
-            "file_paths": request.file_paths if current_step == "suggest" else [],
-            "markdown_paths": markdown_paths if current_step == "process" else [],  # Will be populated by suggest step
-            "user_prompt": request.user_prompt or "",
-            "selected_metrics": selected_metrics_dict,
-            "database_name": settings.snowflake_database,
-            "schema_name": settings.snowflake_schema,
-            "suggested_metrics": [],
-            "reasoning": "",
-            "schema": None,
-            "deployment_result": None,
-            "extracted_metrics": {},
-            "error": ""
-        }
-        
-        # Run the LangGraph pipeline
-        print(f"{'='*60}")
-        print(f"🔄 Running LangGraph MetricExtractionPipeline ({current_step} branch)...")
-        print(f"{'='*60}\n")
+            # Run the LangGraph pipeline
+            logger.info("🔄 Running LangGraph MetricExtractionPipeline (%s branch)", initial_state.current_step)
+            final_state = await metric_pipe.run(initial_state, retry_token=request.retry_token)
+            return initial_state.current_step, final_state
         
-        final_state = await metric_pipe.app.ainvoke(initial_state)
+        # A hung LandingAI, LLM or Snowflake call must not hold the request forever
+        try:
+            current_step, final_state = await asyncio.wait_for(run_pipeline(), timeout=settings.pipeline_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"Processing timed out after {settings.pipeline_timeout}s")
         
         # Check for errors
         if final_state.get("error"):
@@ -250,10 +456,7 @@ async def process_documents(request: ProcessRequest):
         # Build response based on which branch was executed
         if current_step == "suggest":
             # Suggest branch: return suggested metrics and markdown paths
-            suggested_metrics = [
-                MetricDefinition(**metric)
-                for metric in final_state.get("suggested_metrics", [])
-            ]
+            suggested_metrics = METRIC_LIST.validate_python(final_state.get("suggested_metrics", []))
             
             response = ProcessResponse(
                 markdown_paths=final_state.get("markdown_paths", []),
@@ -262,57 +465,70 @@ async def process_documents(request: ProcessRequest):
                 success=True
             )
             
-            print(f"{'='*60}")
-            print(f"✅ SUGGESTION COMPLETE!")
-            print(f"   Suggested {len(suggested_metrics)} metrics")
-            print(f"{'='*60}\n")
+            logger.info("✅ Suggestion complete: %d metrics", len(suggested_metrics))
             
         else:
             # Process branch: return extracted metrics, schema, and deployment
+            # Large runs hand back a state_store handle - release it once read
+            by_document = final_state.get("extracted_metrics_by_document", {})
+            if state_store.is_handle(by_document):
+                by_document = state_store.pop(by_document)
+            
             response = ProcessResponse(
                 markdown_paths=final_state.get("markdown_paths", []),
                 extracted_metrics=final_state.get("extracted_metrics", {}),  # Legacy - first doc only
-                extracted_metrics_by_document=final_state.get("extracted_metrics_by_document", {}),  # New - all docs
+                extracted_metrics_by_document=by_document,  # New - all docs
                 schema=final_state.get("schema"),
                 deployment=final_state.get("deployment_result"),
                 success=True
             )
             
-            print(f"{'='*60}")
-            print(f"✅ PROCESSING COMPLETE!")
-            if final_state.get("schema"):
-                print(f"   Created {len(final_state['schema'].tables)} tables")
-            if final_state.get("deployment_result"):
-                print(f"   Loaded {final_state['deployment_result'].rows_loaded} rows")
-            print(f"{'='*60}\n")
+            logger.info(
+                "✅ Processing complete: %d tables, %d rows loaded",
+                len(final_state["schema"].tables) if final_state.get("schema") else 0,
+                final_state["deployment_result"].rows_loaded if final_state.get("deployment_result") else 0
+            )
         
-        return response
+        # Serialize in pydantic-core straight to JSON bytes; response_model still documents the shape
+        return Response(content=response.model_dump_json(), media_type="application/json")
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"\n{'='*60}")
-        print(f"❌ ERROR: {str(e)}")
-        print(f"{'='*60}\n")
-        traceback.print_exc()
+        logger.exception("❌ Processing failed")
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
 
+
+@app.post("/api/process/stream")
+async def process_documents_stream(request: ProcessRequest):
+    """Stream LangGraph node updates for a processing request as Server-Sent Events"""
+    
+    logger.info("🔄 Streaming request: %d file(s)", len(request.file_paths))
+    
+    initial_state = await build_initial_state(request)
+    metric_pipe = get_pipeline()
+    
+    async def event_stream():
+        async for event in metric_pipe.run_stream(initial_state):
+            # Each node update is flushed as its own SSE frame, written straight to bytes
+            payload = orjson.dumps(event["data"], default=orjson_default)
+            yield b"event: " + event["event"].encode() + b"\ndata: " + payload + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 # --- FIXED: This function now works ---
 @app.post("/api/logs")
 async def add_log_entry(request: Dict[str, Any]):
     """Add a new log entry"""
     try:
         log_entry = {
-            "id": int(time.time() * 1000),  # timestamp-based ID
+            "id": time.time_ns() // 1_000_000,  # timestamp-based ID (ms)
             "message": request.get("message", ""),
             "type": request.get("type", "info"),
             "timestamp": request.get("timestamp", "")
         }
         logs_store.append(log_entry)
-        # Keep only last 1000 logs to prevent memory issues
-        if len(logs_store) > 1000:
-            logs_store.pop(0)
             
         return {"success": True} # <-- This return statement fixes the 500 error
     
@@ -324,7 +540,8 @@ async def add_log_entry(request: Dict[str, Any]):
 async def get_logs():
     """Get all log entries"""
     try:
-        return {"logs": logs_store}
+        # Entries are plain str/int dicts, so orjson can write them straight to bytes
+        return json_response({"logs": list(logs_store)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch logs: {str(e)}")
 
@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+import sys
+from dataclasses import dataclass, field
+from functools import cached_property
+from pydantic import BaseModel, ConfigDict, Field, computed_field, field_validator
+from typing import List, Dict, Any, Literal, Optional, Tuple
 from enum import Enum
 
 class DocumentType(str, Enum):
@@ -9,19 +12,36 @@ class DocumentType(str, Enum):
     CASH_FLOW = "cash_flow"
     UNKNOWN = "unknown"
 
-class ExtractedField(BaseModel):
+# DocumentType values as a Literal, so pydantic-core checks them with a plain
+# string lookup and ExtractionResult stores the str, not an enum member
+DocumentTypeValue = Literal["balance_sheet", "income_statement", "cash_flow", "unknown"]
+
+# Validated by pydantic as part of ExtractionResult, then kept as a plain slotted object
+@dataclass(frozen=True, slots=True)
+class ExtractedField:
     """A single extracted field from a document"""
     field_name: str
     value: float
     confidence: float
     data_type: str = "currency"
+    
+    def __post_init__(self):
+        # Names and types repeat across every document; intern them so the copies share one str
+        object.__setattr__(self, "field_name", sys.intern(self.field_name))
+        object.__setattr__(self, "data_type", sys.intern(self.data_type))
 
 class ExtractionResult(BaseModel):
     """Result of document extraction"""
-    document_type: DocumentType
+    document_type: DocumentTypeValue
     period: str
     extracted_fields: List[ExtractedField]
-    metadata: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    
+    @field_validator("period")
+    @classmethod
+    def intern_period(cls, value: str) -> str:
+        """Share one str per period label (e.g. 'Q3 2024') across documents"""
+        return sys.intern(value)
 
 class FinancialInsight(BaseModel):
     """Financial analysis insights"""
@@ -29,31 +49,62 @@ class FinancialInsight(BaseModel):
     time_period: str
     fiscal_year: int
     fiscal_quarter: Optional[int] = None
-    detected_relationships: List[Dict[str, Any]] = []
-    suggested_metrics: List[str] = []
-    data_quality: Dict[str, float] = {}
-    issues: List[str] = []
-    insights: List[str] = []
+    detected_relationships: List[Dict[str, Any]] = Field(default_factory=list)
+    suggested_metrics: List[str] = Field(default_factory=list)
+    data_quality: Dict[str, float] = Field(default_factory=dict)
+    issues: List[str] = Field(default_factory=list)
+    insights: List[str] = Field(default_factory=list)
 
-class TableColumn(BaseModel):
+# Plain slotted dataclasses: built in bulk by the schema designer and never
+# mutated. Pydantic still validates and serializes them as objects.
+@dataclass(frozen=True, slots=True)
+class TableColumn:
     """Database table column definition"""
     name: str
     type: str
     constraints: str = ""
 
-class TableSchema(BaseModel):
+@dataclass(frozen=True, slots=True)
+class TableSchema:
     """Database table schema"""
     table_name: str
     columns: List[TableColumn]
-    indexes: List[str] = []
+    indexes: List[str] = field(default_factory=list)
+    
+    def create_sql(self) -> str:
+        """Render the CREATE TABLE statement for this table"""
+        col_lines = [f"  {c.name} {c.type} {c.constraints}".rstrip() for c in self.columns]
+        return f"CREATE TABLE IF NOT EXISTS {self.table_name} (\n" + ",\n".join(col_lines) + "\n);"
 
 class DatabaseSchema(BaseModel):
     """Complete database schema design"""
     tables: List[TableSchema]
-    relationships: List[Dict[str, str]] = []
-    validation_rules: List[str] = []
-    clustering_recommendations: List[Dict[str, Any]] = []
-    ddl_sql: str = ""
+    relationships: List[Dict[str, str]] = Field(default_factory=list)
+    validation_rules: List[str] = Field(default_factory=list)
+    clustering_recommendations: List[Dict[str, Any]] = Field(default_factory=list)
+    
+    @computed_field
+    @cached_property
+    def ddl_sql(self) -> str:
+        """DDL for all tables, rendered from `tables` on first access"""
+        ddl_parts = [table.create_sql() for table in self.tables]
+        
+        if self.clustering_recommendations:
+            ddl_parts.append("\n-- Clustering")
+            ddl_parts.extend(
+                f"ALTER TABLE {rec['table']} CLUSTER BY ({', '.join(rec['keys'])});"
+                for rec in self.clustering_recommendations
+            )
+        
+        return "\n\n".join(ddl_parts)
+    
+    @cached_property
+    def ddl_statements(self) -> Tuple[str, ...]:
+        """Executable statements from ddl_sql, with empty and comment-only chunks dropped"""
+        return tuple(
+            stmt for stmt in (part.strip() for part in self.ddl_sql.split(';'))
+            if stmt and not stmt.startswith('--')
+        )
 
 class DeploymentResult(BaseModel):
     """Result of Snowflake deployment"""
@@ -65,32 +116,40 @@ class DeploymentResult(BaseModel):
 
 class MetricDefinition(BaseModel):
     """Definition of a metric to extract"""
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     type: str  # str, int, float, bool
     description: str
     
 class ProcessRequest(BaseModel):
     """Request to process documents"""
+    # Immutable once validated; unknown keys are rejected rather than silently dropped
+    model_config = ConfigDict(extra="forbid", frozen=True)
+    
     file_paths: List[str]
     user_prompt: Optional[str] = None  # Optional prompt for metric suggestions
     selected_metrics: Optional[List[MetricDefinition]] = None  # Selected metrics for extraction
     stop_after: Optional[str] = "all"  # "extract" | "analyze" | "schema" | "deploy" | "all" - which step to stop after
+    retry_token: Optional[str] = None  # Client-chosen id; resending it after a failure resumes that run
 
 class ProcessResponse(BaseModel):
     """Complete processing response"""
-    markdown_paths: List[str] = []  # Markdown files extracted
+    model_config = ConfigDict(frozen=True)
+    
+    markdown_paths: List[str] = Field(default_factory=list)  # Markdown files extracted
     suggested_metrics: Optional[List[MetricDefinition]] = None  # AI-suggested metrics
     extracted_metrics: Optional[Dict[str, Any]] = None  # Extracted metric values (legacy - use extracted_metrics_by_document)
     extracted_metrics_by_document: Optional[Dict[str, Dict[str, Any]]] = None  # New: metrics by document name
     schema: Optional[DatabaseSchema] = None  # Optional - only present after processing
     deployment: Optional[DeploymentResult] = None  # Optional - only present after processing
-    extraction_results: List[ExtractionResult] = []  # Legacy field for compatibility
+    extraction_results: List[ExtractionResult] = Field(default_factory=list)  # Legacy field for compatibility
     analysis: Optional[FinancialInsight] = None  # Legacy field for compatibility
     reasoning: Optional[str] = None  # Reasoning for metric suggestions
     success: Optional[bool] = True  # Success flag
 class AnalysisQuery(BaseModel):
     query: str
-    conversation_history: Optional[List[Dict[str, str]]] = []
+    conversation_history: Optional[List[Dict[str, str]]] = Field(default_factory=list)
 
 class ChartSpec(BaseModel):
     chart_type: str  # 'line', 'bar', 'pie', 'table'